@@ -1,5 +1,4 @@
 import os
-import platform
 import subprocess
 
 def get_providers():
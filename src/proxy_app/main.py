@@ -2,6 +2,8 @@ print("Proxy starting...")
 print("GitHub: https://github.com/Mirrowel/LLM-API-Key-Proxy")
 import asyncio
 import os
+import re
+from collections import defaultdict
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
@@ -9,11 +11,13 @@ from fastapi.responses import StreamingResponse
 from fastapi.security import APIKeyHeader
 from dotenv import load_dotenv
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
 import colorlog
 from pathlib import Path
 import sys
-import json
-from typing import AsyncGenerator, Any, List, Optional, Union
+import orjson
+from typing import AsyncGenerator, List, Optional, Union
 from pydantic import BaseModel
 import argparse
 import litellm
@@ -39,7 +43,7 @@ args, _ = parser.parse_known_args()
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from rotator_library import RotatingClient, PROVIDER_PLUGINS
-from proxy_app.request_logger import log_request_response, log_request_to_console
+from proxy_app.request_logger import log_request_response, log_request_to_console, ensure_log_dirs
 from proxy_app.batch_manager import EmbeddingBatcher
 
 # --- Logging Configuration ---
@@ -87,10 +91,18 @@ console_handler.addFilter(NoLiteLLMLogFilter())
 root_logger = logging.getLogger()
 root_logger.setLevel(logging.DEBUG)
 
-# Add all handlers to the root logger
-root_logger.addHandler(info_file_handler)
-root_logger.addHandler(console_handler)
-root_logger.addHandler(debug_file_handler)
+# Route all records through a queue so the file and console handlers run on a
+# background thread and logging calls in the request path never wait on I/O.
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(
+    log_queue,
+    info_file_handler,
+    console_handler,
+    debug_file_handler,
+    respect_handler_level=True
+)
+root_logger.addHandler(QueueHandler(log_queue))
+log_listener.start()
 
 # Silence other noisy loggers by setting their level higher than root
 logging.getLogger("uvicorn").setLevel(logging.WARNING)
@@ -107,20 +119,31 @@ load_dotenv()
 # --- Configuration ---
 USE_EMBEDDING_BATCHER = False
 ENABLE_REQUEST_LOGGING = args.enable_request_logging
+# Merge streamed SSE events into writes of up to this many bytes. 0 (the default)
+# sends every event as soon as it arrives, which gives the lowest latency.
+COALESCE_SSE_BYTES = int(os.getenv("COALESCE_SSE_BYTES", "0"))
+# Longest time an event may wait in the coalescing buffer before it is sent.
+COALESCE_SSE_MAX_DELAY = 0.005
+# Streamed-response log writes that are still running. Each one runs as its own task
+# so a cancelled stream cannot abort it; the set keeps them referenced until done.
+pending_log_writes = set()
 PROXY_API_KEY = os.getenv("PROXY_API_KEY")
 if not PROXY_API_KEY:
     raise ValueError("PROXY_API_KEY environment variable not set.")
 
-# Load all provider API keys from environment variables
-api_keys = {}
+# Load all provider API keys from environment variables.
+# Matches names like GEMINI_API_KEY or NVIDIA_NIM_API_KEY_1; the group is the provider.
+API_KEY_ENV_PATTERN = re.compile(r"^(.+?)_API_KEY(?:_\w+)?$")
+api_keys = defaultdict(list)
 for key, value in os.environ.items():
     # Exclude PROXY_API_KEY from being treated as a provider API key
-    if (key.endswith("_API_KEY") or "_API_KEY_" in key) and key != "PROXY_API_KEY":
-        parts = key.split("_API_KEY")
-        provider = parts[0].lower()
-        if provider not in api_keys:
-            api_keys[provider] = []
-        api_keys[provider].append(value)
+    if key == "PROXY_API_KEY":
+        continue
+    match = API_KEY_ENV_PATTERN.match(key)
+    if match:
+        api_keys[match.group(1).lower()].append(value)
+# Hand the client a plain dict so lookups of unknown providers don't create entries
+api_keys = dict(api_keys)
 
 if not api_keys:
     raise ValueError("No provider API keys found in environment variables.")
@@ -129,6 +152,8 @@ if not api_keys:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage the RotatingClient's lifecycle with the app's lifespan."""
+    if ENABLE_REQUEST_LOGGING:
+        ensure_log_dirs()
      # The client now uses the root logger configuration
     client = RotatingClient(api_keys=api_keys, configure_logging=True)
     client.start_model_cache_population()  # Start the background task
@@ -155,6 +180,13 @@ async def lifespan(app: FastAPI):
     else:
         logging.info("RotatingClient closed.")
 
+    # Let any request-log writes from disconnected streams finish
+    if pending_log_writes:
+        await asyncio.gather(*pending_log_writes, return_exceptions=True)
+
+    # Flush any queued log records to their handlers before the process exits
+    log_listener.stop()
+
 # --- FastAPI App Setup ---
 app = FastAPI(lifespan=lifespan)
 
@@ -191,59 +223,51 @@ async def streaming_response_wrapper(
     Wraps a streaming response to log the full response after completion
     and ensures any errors during the stream are sent to the client.
     """
-    response_chunks = []
     full_response = {}
-    
+    stream_error = None
+
+    # The response is aggregated as chunks arrive, so only the running result
+    # is held in memory rather than every chunk of the stream.
+    first_chunk = None
+    final_message = {"role": "assistant"}
+    aggregated_tool_calls = {}
+    usage_data = None
+    finish_reason = None
+    aggregate = ENABLE_REQUEST_LOGGING
+    aggregation_error = None
+
     try:
         async for chunk_str in response_stream:
             if await request.is_disconnected():
                 logging.warning("Client disconnected, stopping stream.")
                 break
             yield chunk_str
-            if chunk_str.strip() and chunk_str.startswith("data:"):
-                content = chunk_str[len("data:"):].strip()
-                if content != "[DONE]":
-                    try:
-                        chunk_data = json.loads(content)
-                        response_chunks.append(chunk_data)
-                    except json.JSONDecodeError:
-                        pass  # Ignore non-JSON chunks
-    except Exception as e:
-        logging.error(f"An error occurred during the response stream: {e}")
-        # Yield a final error message to the client to ensure they are not left hanging.
-        error_payload = {
-            "error": {
-                "message": f"An unexpected error occurred during the stream: {str(e)}",
-                "type": "proxy_internal_error",
-                "code": 500
-            }
-        }
-        yield f"data: {json.dumps(error_payload)}\n\n"
-        yield "data: [DONE]\n\n"
-        # Also log this as a failed request
-        if ENABLE_REQUEST_LOGGING:
-            log_request_response(
-                request_data=request_data,
-                response_data={"error": str(e)},
-                is_streaming=True,
-                log_type="completion"
-            )
-        return # Stop further processing
-    finally:
-        if response_chunks:
-            # --- Aggregation Logic ---
-            final_message = {"role": "assistant"}
-            aggregated_tool_calls = {}
-            usage_data = None
-            finish_reason = None
-
-            for chunk in response_chunks:
-                if "choices" in chunk and chunk["choices"]:
-                    choice = chunk["choices"][0]
-                    delta = choice.get("delta", {})
+            # The aggregated response is only used for the request log, so skip
+            # parsing the stream entirely when logging is off or aggregation gave up.
+            if not aggregate or not chunk_str.startswith("data:"):
+                continue
+            # orjson skips the whitespace around the payload itself, so the slice
+            # after "data:" is parsed as-is without a separate strip() copy.
+            try:
+                chunk = orjson.loads(chunk_str[5:])
+            except orjson.JSONDecodeError:
+                continue  # Ignore non-JSON chunks, including the [DONE] sentinel
+
+            # Aggregation only feeds the request log. It runs in its own try so a chunk
+            # it can't handle stops the aggregation but never ends the client's stream.
+            try:
+                if first_chunk is None:
+                    first_chunk = chunk
+
+                # --- Aggregation Logic ---
+                # Each field is looked up once per chunk; this runs for every streamed token.
+                choices = chunk.get("choices")
+                if choices:
+                    choice = choices[0]
+                    delta = choice.get("delta")
 
                     # Dynamically aggregate all fields from the delta
-                    for key, value in delta.items():
+                    for key, value in (delta.items() if delta else ()):
                         if value is None:
                             continue
 
@@ -252,42 +276,76 @@ async def streaming_response_wrapper(
                                 final_message["content"] = ""
                             if value:
                                 final_message["content"] += value
-                        
+
                         elif key == "tool_calls":
                             for tc_chunk in value:
                                 index = tc_chunk["index"]
-                                if index not in aggregated_tool_calls:
-                                    aggregated_tool_calls[index] = {"id": None, "type": "function", "function": {"name": "", "arguments": ""}}
-                                if tc_chunk.get("id"):
-                                    aggregated_tool_calls[index]["id"] = tc_chunk["id"]
-                                if "function" in tc_chunk:
-                                    if "name" in tc_chunk["function"]:
-                                        aggregated_tool_calls[index]["function"]["name"] += tc_chunk["function"]["name"]
-                                    if "arguments" in tc_chunk["function"]:
-                                        aggregated_tool_calls[index]["function"]["arguments"] += tc_chunk["function"]["arguments"]
-                        
+                                tool_call = aggregated_tool_calls.get(index)
+                                if tool_call is None:
+                                    tool_call = aggregated_tool_calls[index] = {"id": None, "type": "function", "function": {"name": "", "arguments": ""}}
+                                tc_id = tc_chunk.get("id")
+                                if tc_id:
+                                    tool_call["id"] = tc_id
+                                tc_function = tc_chunk.get("function")
+                                if tc_function is not None:
+                                    # Follow-up deltas carry "name": null, so only append real values
+                                    tc_name = tc_function.get("name")
+                                    if tc_name:
+                                        tool_call["function"]["name"] += tc_name
+                                    tc_arguments = tc_function.get("arguments")
+                                    if tc_arguments:
+                                        tool_call["function"]["arguments"] += tc_arguments
+
                         elif key == "function_call":
-                            if "function_call" not in final_message:
-                                final_message["function_call"] = {"name": "", "arguments": ""}
-                            if "name" in value:
-                                final_message["function_call"]["name"] += value["name"]
-                            if "arguments" in value:
-                                final_message["function_call"]["arguments"] += value["arguments"]
-                        
+                            function_call = final_message.get("function_call")
+                            if function_call is None:
+                                function_call = final_message["function_call"] = {"name": "", "arguments": ""}
+                            fc_name = value.get("name")
+                            if fc_name:
+                                function_call["name"] += fc_name
+                            fc_arguments = value.get("arguments")
+                            if fc_arguments:
+                                function_call["arguments"] += fc_arguments
+
                         else: # Generic key handling for other data like 'reasoning'
-                            if key not in final_message:
-                                final_message[key] = value
-                            elif isinstance(final_message.get(key), str):
-                                final_message[key] += value
+                            existing = final_message.get(key)
+                            if isinstance(existing, str):
+                                final_message[key] = existing + value
                             else:
                                 final_message[key] = value
 
-                    if "finish_reason" in choice and choice["finish_reason"]:
-                        finish_reason = choice["finish_reason"]
-
-                if "usage" in chunk and chunk["usage"]:
-                    usage_data = chunk["usage"]
-
+                    chunk_finish_reason = choice.get("finish_reason")
+                    if chunk_finish_reason:
+                        finish_reason = chunk_finish_reason
+
+                chunk_usage = chunk.get("usage")
+                if chunk_usage:
+                    usage_data = chunk_usage
+            except Exception as e:
+                logging.error(f"Could not aggregate streamed response for the request log: {e}")
+                aggregation_error = str(e)
+                aggregate = False
+    except Exception as e:
+        logging.error(f"An error occurred during the response stream: {e}")
+        # Recorded before yielding so the finally block logs this as a failed request
+        # even if the client goes away while the error is being sent.
+        stream_error = str(e)
+        # Yield a final error message to the client to ensure they are not left hanging.
+        error_payload = {
+            "error": {
+                "message": f"An unexpected error occurred during the stream: {str(e)}",
+                "type": "proxy_internal_error",
+                "code": 500
+            }
+        }
+        yield f"data: {orjson.dumps(error_payload).decode()}\n\n"
+        yield "data: [DONE]\n\n"
+    finally:
+        if stream_error is not None:
+            full_response = {"error": stream_error}
+        elif aggregation_error is not None:
+            full_response = {"error": f"Could not aggregate streamed response: {aggregation_error}"}
+        elif first_chunk is not None:
             # --- Final Response Construction ---
             if aggregated_tool_calls:
                 final_message["tool_calls"] = list(aggregated_tool_calls.values())
@@ -297,7 +355,6 @@ async def streaming_response_wrapper(
                 if field not in final_message:
                     final_message[field] = None
 
-            first_chunk = response_chunks[0]
             final_choice = {
                 "index": 0,
                 "message": final_message,
@@ -314,12 +371,77 @@ async def streaming_response_wrapper(
             }
 
         if ENABLE_REQUEST_LOGGING:
-            log_request_response(
+            # When the client disconnects, this generator is cancelled (repeatedly, under
+            # anyio), which would abort an awaited write midway and lose the log. The write
+            # runs in its own task instead, and is shielded while we wait for it.
+            log_task = asyncio.create_task(log_request_response(
                 request_data=request_data,
                 response_data=full_response,
                 is_streaming=True,
                 log_type="completion"
-            )
+            ))
+            pending_log_writes.add(log_task)
+            log_task.add_done_callback(pending_log_writes.discard)
+            await asyncio.shield(log_task)
+
+async def coalesce_sse_chunks(
+    stream: AsyncGenerator[str, None],
+    max_bytes: int,
+    max_delay: float = COALESCE_SSE_MAX_DELAY
+) -> AsyncGenerator[str, None]:
+    """
+    Merges consecutive SSE events from a stream into larger writes to cut down on
+    per-event send overhead. Buffered events are flushed once `max_bytes` is reached,
+    once the oldest one has waited `max_delay` seconds, or when the stream ends.
+    Events are only ever concatenated whole, so SSE framing is preserved.
+    """
+    loop = asyncio.get_running_loop()
+    stream_iterator = stream.__aiter__()
+    buffer = []
+    buffered_bytes = 0
+    flush_deadline = 0.0
+    pending = None
+
+    try:
+        while True:
+            if pending is None:
+                # Fetch the next event in a task so waiting for it can time out
+                # without cancelling the upstream generator.
+                pending = asyncio.ensure_future(stream_iterator.__anext__())
+            if buffer:
+                done, _ = await asyncio.wait((pending,), timeout=max(0.0, flush_deadline - loop.time()))
+                if not done:
+                    yield "".join(buffer)
+                    buffer.clear()
+                    buffered_bytes = 0
+                    continue
+            try:
+                chunk = await pending
+            except StopAsyncIteration:
+                pending = None
+                break
+            pending = None
+
+            if not buffer:
+                flush_deadline = loop.time() + max_delay
+            buffer.append(chunk)
+            buffered_bytes += len(chunk)
+            if buffered_bytes >= max_bytes:
+                yield "".join(buffer)
+                buffer.clear()
+                buffered_bytes = 0
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+            # Wait for the cancellation to land so the upstream generator is no longer running
+            await asyncio.wait((pending,))
+        # Close the upstream stream now rather than at garbage collection, so its own
+        # cleanup (recording usage and releasing the API key) runs straight away.
+        if not getattr(stream, "ag_running", False):
+            await stream.aclose()
 
 @app.post("/v1/chat/completions")
 async def chat_completions(
@@ -331,11 +453,13 @@ async def chat_completions(
     OpenAI-compatible endpoint powered by the RotatingClient.
     Handles both streaming and non-streaming responses and logs them.
     """
+    # Bound before the try so the error handler can reuse the parsed body
+    # instead of reading the request stream a second time.
+    request_data = None
     try:
         request_data = await request.json()
         log_request_to_console(
             url=str(request.url),
-            headers=dict(request.headers),
             client_info=(request.client.host, request.client.port),
             request_data=request_data
         )
@@ -343,14 +467,17 @@ async def chat_completions(
 
         if is_streaming:
             response_generator = client.acompletion(request=request, **request_data)
+            response_stream = streaming_response_wrapper(request, request_data, response_generator)
+            if COALESCE_SSE_BYTES > 0:
+                response_stream = coalesce_sse_chunks(response_stream, COALESCE_SSE_BYTES)
             return StreamingResponse(
-                streaming_response_wrapper(request, request_data, response_generator),
+                response_stream,
                 media_type="text/event-stream"
             )
         else:
             response = await client.acompletion(request=request, **request_data)
             if ENABLE_REQUEST_LOGGING:
-                log_request_response(
+                await log_request_response(
                     request_data=request_data,
                     response_data=response.model_dump(),
                     is_streaming=False,
@@ -374,11 +501,9 @@ async def chat_completions(
         logging.error(f"Request failed after all retries: {e}")
         # Optionally log the failed request
         if ENABLE_REQUEST_LOGGING:
-            try:
-                request_data = await request.json()
-            except json.JSONDecodeError:
+            if request_data is None:
                 request_data = {"error": "Could not parse request body"}
-            log_request_response(
+            await log_request_response(
                 request_data=request_data,
                 response_data={"error": str(e)},
                 is_streaming=request_data.get("stream", False),
@@ -400,37 +525,33 @@ async def embeddings(
     - True: Uses a server-side batcher for high throughput.
     - False: Passes requests directly to the provider.
     """
+    # Dumped once and shared by both code paths and the request log
+    request_data = body.model_dump(exclude_none=True)
     try:
-        request_data = body.model_dump(exclude_none=True)
         log_request_to_console(
             url=str(request.url),
-            headers=dict(request.headers),
             client_info=(request.client.host, request.client.port),
             request_data=request_data
         )
         if USE_EMBEDDING_BATCHER and batcher:
             # --- Server-Side Batching Logic ---
-            request_data = body.model_dump(exclude_none=True)
             inputs = request_data.get("input", [])
             if isinstance(inputs, str):
                 inputs = [inputs]
 
-            tasks = []
-            for single_input in inputs:
-                individual_request = request_data.copy()
-                individual_request["input"] = single_input
-                tasks.append(batcher.add_request(individual_request))
+            tasks = [
+                batcher.add_request({**request_data, "input": single_input})
+                for single_input in inputs
+            ]
             
             results = await asyncio.gather(*tasks)
 
             all_data = []
-            total_prompt_tokens = 0
-            total_tokens = 0
             for i, result in enumerate(results):
                 result["data"][0]["index"] = i
                 all_data.extend(result["data"])
-                total_prompt_tokens += result["usage"]["prompt_tokens"]
-                total_tokens += result["usage"]["total_tokens"]
+            total_prompt_tokens = sum(result["usage"]["prompt_tokens"] for result in results)
+            total_tokens = sum(result["usage"]["total_tokens"] for result in results)
 
             final_response_data = {
                 "object": "list",
@@ -442,11 +563,12 @@ async def embeddings(
         
         else:
             # --- Direct Pass-Through Logic ---
-            request_data = body.model_dump(exclude_none=True)
+            embedding_kwargs = request_data
             if isinstance(request_data.get("input"), str):
-                request_data["input"] = [request_data["input"]]
+                # Copy so the logged request keeps the input exactly as it was sent
+                embedding_kwargs = {**request_data, "input": [request_data["input"]]}
             
-            response = await client.aembedding(request=request, **request_data)
+            response = await client.aembedding(request=request, **embedding_kwargs)
 
         if ENABLE_REQUEST_LOGGING:
             response_summary = {
@@ -456,8 +578,8 @@ async def embeddings(
                 "data_count": len(response.data),
                 "embedding_dimensions": len(response.data[0].embedding) if response.data else 0
             }
-            log_request_response(
-                request_data=body.model_dump(exclude_none=True),
+            await log_request_response(
+                request_data=request_data,
                 response_data=response_summary,
                 is_streaming=False,
                 log_type="embedding"
@@ -482,11 +604,7 @@ async def embeddings(
     except Exception as e:
         logging.error(f"Embedding request failed: {e}")
         if ENABLE_REQUEST_LOGGING:
-            try:
-                request_data = await request.json()
-            except json.JSONDecodeError:
-                request_data = {"error": "Could not parse request body"}
-            log_request_response(
+            await log_request_response(
                 request_data=request_data,
                 response_data={"error": str(e)},
                 is_streaming=False,
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Optional
 
 # A comprehensive map of provider names to their base URLs.
@@ -28,6 +29,8 @@ PROVIDER_URL_MAP = {
     "openrouter": "https://openrouter.ai/api/v1",
 }
 
+# Requests repeat the same few provider/model/path combinations, so the built URL is cached.
+@lru_cache(maxsize=256)
 def get_provider_endpoint(provider: str, model_name: str, incoming_path: str) -> Optional[str]:
     """
     Constructs the full provider endpoint URL based on the provider and incoming request path.
@@ -1,10 +1,12 @@
-import json
 import os
+import random
+import time
 from datetime import datetime
 from pathlib import Path
-import uuid
-from typing import Literal, Dict
+from typing import Literal
 import logging
+import aiofiles
+import orjson
 
 from .provider_urls import get_provider_endpoint
 
@@ -12,16 +14,51 @@ LOGS_DIR = Path(__file__).resolve().parent.parent.parent / "logs"
 COMPLETIONS_LOGS_DIR = LOGS_DIR / "completions"
 EMBEDDINGS_LOGS_DIR = LOGS_DIR / "embeddings"
 
-# Create directories if they don't exist
-LOGS_DIR.mkdir(exist_ok=True)
-COMPLETIONS_LOGS_DIR.mkdir(exist_ok=True)
-EMBEDDINGS_LOGS_DIR.mkdir(exist_ok=True)
+def ensure_log_dirs():
+    """
+    Creates the request log directories. Called once at startup when request
+    logging is enabled, so nothing is touched on disk per request or when it is off.
+    """
+    COMPLETIONS_LOGS_DIR.mkdir(parents=True, exist_ok=True)
+    EMBEDDINGS_LOGS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Log file names only need to be unique, not unpredictable, so a PRNG seeded once
+# from the OS replaces a uuid4() (and its getrandom syscall) per request.
+_id_rng = random.Random(os.urandom(32))
+
+# The filename timestamp has one-second resolution; cache it for the current second.
+_last_ts_second = None
+_last_ts_str = ""
+
+def _log_file_stem() -> str:
+    """Returns a unique '<timestamp>_<uuid>' stem for a new log file."""
+    global _last_ts_second, _last_ts_str
+    now = int(time.time())
+    if now != _last_ts_second:
+        _last_ts_str = datetime.fromtimestamp(now).strftime("%Y%m%d_%H%M%S")
+        _last_ts_second = now
+    h = f"{_id_rng.getrandbits(128):032x}"
+    return f"{_last_ts_str}_{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+# Same idea for the console summary, which only shows hours and minutes.
+_last_console_minute = None
+_last_console_str = ""
+
+def _console_time_str() -> str:
+    """Returns the current local time as 'HH:MM', formatted once per minute."""
+    global _last_console_minute, _last_console_str
+    now = time.time()
+    minute = int(now // 60)
+    if minute != _last_console_minute:
+        _last_console_str = datetime.fromtimestamp(now).strftime("%H:%M")
+        _last_console_minute = minute
+    return _last_console_str
 
-def log_request_to_console(url: str, headers: dict, client_info: tuple, request_data: dict):
+def log_request_to_console(url: str, client_info: tuple, request_data: dict):
     """
     Logs a concise, single-line summary of an incoming request to the console.
     """
-    time_str = datetime.now().strftime("%H:%M")
+    time_str = _console_time_str()
     model_full = request_data.get("model", "N/A")
     
     provider = "N/A"
@@ -38,7 +75,7 @@ def log_request_to_console(url: str, headers: dict, client_info: tuple, request_
     log_message = f"{time_str} - {client_info[0]}:{client_info[1]} - provider: {provider}, model: {model_name} - {endpoint_url}"
     logging.info(log_message)
 
-def log_request_response(
+async def log_request_response(
     request_data: dict,
     response_data: dict,
     is_streaming: bool,
@@ -46,11 +83,9 @@ def log_request_response(
 ):
     """
     Logs the request and response data to a file in the appropriate log directory.
+    The file is written asynchronously so the event loop is not blocked on disk I/O.
     """
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = uuid.uuid4()
-        
         if log_type == "completion":
             target_dir = COMPLETIONS_LOGS_DIR
         elif log_type == "embedding":
@@ -59,7 +94,7 @@ def log_request_response(
             # Fallback to the main logs directory if log_type is invalid
             target_dir = LOGS_DIR
 
-        filename = target_dir / f"{timestamp}_{unique_id}.json"
+        filename = target_dir / f"{_log_file_stem()}.json"
 
         log_content = {
             "request": request_data,
@@ -67,8 +102,8 @@ def log_request_response(
             "is_streaming": is_streaming
         }
 
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(log_content, f, indent=4, ensure_ascii=False)
+        async with aiofiles.open(filename, "wb") as f:
+            await f.write(orjson.dumps(log_content, option=orjson.OPT_INDENT_2))
             
     except Exception as e:
         # In case of logging failure, we don't want to crash the main application
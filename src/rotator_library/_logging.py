@@ -0,0 +1,9 @@
+import logging
+
+# The library's shared logger, configured once for every module that imports it.
+# It stays silent by default; RotatingClient(configure_logging=True) turns on
+# propagation so the parent application's handlers receive its records.
+lib_logger = logging.getLogger('rotator_library')
+lib_logger.propagate = False
+if not lib_logger.handlers:
+    lib_logger.addHandler(logging.NullHandler())
@@ -12,12 +12,7 @@ from litellm.litellm_core_utils.token_counter import token_counter
 import logging
 from typing import List, Dict, Any, AsyncGenerator, Optional, Union
 
-lib_logger = logging.getLogger('rotator_library')
-# Ensure the logger is configured to propagate to the root logger
-# which is set up in main.py. This allows the main app to control
-# log levels and handlers centrally.
-lib_logger.propagate = False
-
+from ._logging import lib_logger
 from .usage_manager import UsageManager
 from .failure_logger import log_failure
 from .error_handler import PreRequestCallbackError, classify_error, AllProviders, NoAvailableKeysError
@@ -25,6 +20,23 @@ from .providers import PROVIDER_PLUGINS
 from .request_sanitizer import sanitize_request_payload
 from .cooldown_manager import CooldownManager
 
+# Keys to remove at any level of a LiteLLM log dictionary
+LITELLM_LOG_KEYS_TO_POP = (
+    "messages", "input", "response", "data", "api_key",
+    "api_base", "original_response", "additional_args"
+)
+
+# Keys in a LiteLLM log that might contain nested dictionaries to clean
+LITELLM_LOG_NESTED_KEYS = ("kwargs", "litellm_params", "model_info", "proxy_server_request")
+
+# Patterns for pulling the JSON error body out of a stream exception's message
+BYTES_JSON_PATTERN = re.compile(r"b'(\{.*\})'", re.DOTALL)
+JSON_OBJECT_DOTALL_PATTERN = re.compile(r'(\{.*\})', re.DOTALL)
+
+# Upper bound, in seconds, on fetching one provider's model list at startup, so a
+# single slow provider cannot hold up the whole model cache.
+MODEL_LIST_TIMEOUT = 10
+
 class StreamedAPIError(Exception):
     """Custom exception to signal an API error received over a stream."""
     def __init__(self, message, data=None):
@@ -70,10 +82,16 @@ class RotatingClient:
     async def _populate_model_cache(self):
         """Asynchronously populates the model list cache."""
         try:
-            tasks = [self.get_available_models(provider) for provider in self.api_keys.keys()]
+            tasks = [
+                asyncio.wait_for(self.get_available_models(provider), timeout=MODEL_LIST_TIMEOUT)
+                for provider in self.api_keys.keys()
+            ]
             results = await asyncio.gather(*tasks, return_exceptions=True)
             for provider, result in zip(self.api_keys.keys(), results):
-                if isinstance(result, Exception):
+                if isinstance(result, asyncio.TimeoutError):
+                    lib_logger.error(f"Timed out after {MODEL_LIST_TIMEOUT}s getting models for provider {provider}")
+                    self._model_list_cache[provider] = []
+                elif isinstance(result, Exception):
                     lib_logger.error(f"Failed to get models for provider {provider}: {result}")
                     self._model_list_cache[provider] = []
                 else:
@@ -91,15 +109,6 @@ class RotatingClient:
         if not isinstance(log_data, dict):
             return log_data
 
-        # Keys to remove at any level of the dictionary
-        keys_to_pop = [
-            "messages", "input", "response", "data", "api_key",
-            "api_base", "original_response", "additional_args"
-        ]
-        
-        # Keys that might contain nested dictionaries to clean
-        nested_keys = ["kwargs", "litellm_params", "model_info", "proxy_server_request"]
-
         # Create a deep copy to avoid modifying the original log object in memory
         clean_data = json.loads(json.dumps(log_data, default=str))
 
@@ -108,11 +117,11 @@ class RotatingClient:
                 return
 
             # Remove sensitive/large keys
-            for key in keys_to_pop:
+            for key in LITELLM_LOG_KEYS_TO_POP:
                 data_dict.pop(key, None)
             
             # Recursively clean nested dictionaries
-            for key in nested_keys:
+            for key in LITELLM_LOG_NESTED_KEYS:
                 if key in data_dict and isinstance(data_dict[key], dict):
                     clean_recursively(data_dict[key])
             
@@ -130,6 +139,10 @@ class RotatingClient:
         This allows us to control the log level and destination of litellm's output.
         It also cleans up error logs for better readability in debug files.
         """
+        # Everything below is logged at DEBUG; skip the sanitizing deep copy when it would be dropped.
+        if not lib_logger.isEnabledFor(logging.DEBUG):
+            return
+
         # For successful calls or pre-call logs, a simple debug message is enough.
         if not log_data.get("exception"):
             sanitized_log = self._sanitize_litellm_log(log_data)
@@ -158,9 +171,10 @@ class RotatingClient:
         await self.close()
 
     async def close(self):
-        """Close the HTTP client to prevent resource leaks."""
+        """Close the HTTP client to prevent resource leaks and flush pending usage data."""
         if hasattr(self, 'http_client') and self.http_client:
             await self.http_client.aclose()
+        await self.usage_manager.close()
         # Cancel the cache task if it's running
         if self._model_list_cache_task and not self._model_list_cache_task.done():
             self._model_list_cache_task.cancel()
@@ -206,6 +220,13 @@ class RotatingClient:
             # Returning None might be safer than blocking.
             return None
 
+        return self._get_or_create_provider_instance(provider_name)
+
+    def _get_or_create_provider_instance(self, provider_name: str):
+        """
+        Returns the provider instance, creating it on first use, without checking
+        whether the model cache is ready.
+        """
         if provider_name not in self._provider_instances:
             if provider_name in self._provider_plugins:
                 self._provider_instances[provider_name] = self._provider_plugins[provider_name]()
@@ -239,7 +260,9 @@ class RotatingClient:
                         lib_logger.warning(f"Discarding incomplete JSON buffer from previous chunk: {json_buffer}")
                         json_buffer = ""
                     
-                    yield f"data: {json.dumps(chunk.dict())}\n\n"
+                    # Serialize straight from the pydantic model instead of building
+                    # an intermediate dict and re-encoding it with json.dumps.
+                    yield f"data: {chunk.model_dump_json()}\n\n"
 
                     if not usage_recorded and hasattr(chunk, 'usage') and chunk.usage:
                         await self.usage_manager.record_success(key, model, chunk)
@@ -263,7 +286,7 @@ class RotatingClient:
                         raw_chunk = ""
                         # Google streams errors inside a bytes representation (b'{...}').
                         # We use regex to extract the content, which is more reliable than splitting.
-                        match = re.search(r"b'(\{.*\})'", str(e), re.DOTALL)
+                        match = BYTES_JSON_PATTERN.search(str(e))
                         if match:
                             # The extracted string is unicode-escaped (e.g., '\\n'). We must decode it.
                             raw_chunk = codecs.decode(match.group(1), 'unicode_escape')
@@ -398,7 +421,7 @@ class RotatingClient:
                 key_acquired = True
                 tried_keys.add(current_key)
 
-                litellm_kwargs = self.all_providers.get_provider_kwargs(**kwargs.copy())
+                litellm_kwargs = self.all_providers.get_provider_kwargs(**kwargs)
                 provider_instance = self._get_provider_instance(provider)
                 if provider_instance:
                     if "safety_settings" in litellm_kwargs:
@@ -561,7 +584,7 @@ class RotatingClient:
                     key_acquired = True
                     tried_keys.add(current_key)
 
-                    litellm_kwargs = self.all_providers.get_provider_kwargs(**kwargs.copy())
+                    litellm_kwargs = self.all_providers.get_provider_kwargs(**kwargs)
                     provider_instance = self._get_provider_instance(provider)
                     if provider_instance:
                         if "safety_settings" in litellm_kwargs:
@@ -620,7 +643,7 @@ class RotatingClient:
 
                             try:
                                 # The full error JSON is in the string representation of the exception.
-                                json_str_match = re.search(r'(\{.*\})', str(original_exc), re.DOTALL)
+                                json_str_match = JSON_OBJECT_DOTALL_PATTERN.search(str(original_exc))
                                 if json_str_match:
                                     # The string may contain byte-escaped characters (e.g., \\n).
                                     cleaned_str = codecs.decode(json_str_match.group(1), 'unicode_escape')
@@ -836,7 +859,9 @@ class RotatingClient:
         shuffled_keys = list(keys_for_provider)
         random.shuffle(shuffled_keys)
 
-        provider_instance = self._get_provider_instance(provider)
+        # Model discovery is what populates the cache, so it must not wait for the
+        # cache to be ready (that check would skip every provider during population).
+        provider_instance = self._get_or_create_provider_instance(provider)
         if provider_instance:
             for api_key in shuffled_keys:
                 try:
@@ -866,8 +891,8 @@ class RotatingClient:
         if grouped:
             return self._model_list_cache
         else:
-            flat_models = []
-            for provider, models in self._model_list_cache.items():
-                for model in models:
-                    flat_models.append(f"{provider}/{model}")
-            return flat_models
\ No newline at end of file
+            return [
+                f"{provider}/{model}"
+                for provider, models in self._model_list_cache.items()
+                for model in models
+            ]
\ No newline at end of file
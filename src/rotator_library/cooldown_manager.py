@@ -14,8 +14,8 @@ class CooldownManager:
 
     async def is_cooling_down(self, provider: str) -> bool:
         """Checks if a provider is currently in a cooldown period."""
-        async with self._lock:
-            return provider in self._cooldowns and time.time() < self._cooldowns[provider]
+        # A single dict read cannot observe a partial write, so no lock is needed here.
+        return time.monotonic() < self._cooldowns.get(provider, 0.0)
 
     async def start_cooldown(self, provider: str, duration: int):
         """
@@ -23,15 +23,12 @@ class CooldownManager:
         The cooldown is set to the current time plus the specified duration.
         """
         async with self._lock:
-            self._cooldowns[provider] = time.time() + duration
+            self._cooldowns[provider] = time.monotonic() + duration
 
     async def get_cooldown_remaining(self, provider: str) -> float:
         """
         Returns the remaining cooldown time in seconds for a provider.
         Returns 0 if the provider is not in a cooldown period.
         """
-        async with self._lock:
-            if provider in self._cooldowns:
-                remaining = self._cooldowns[provider] - time.time()
-                return max(0, remaining)
-            return 0
\ No newline at end of file
+        remaining = self._cooldowns.get(provider, 0.0) - time.monotonic()
+        return max(0, remaining)
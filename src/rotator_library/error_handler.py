@@ -24,6 +24,16 @@ class ClassifiedError:
 
 import json
 
+# Compiled once at import; these run against every error message that gets classified.
+JSON_OBJECT_PATTERN = re.compile(r'(\{.*\})')
+RETRY_AFTER_PATTERNS = (
+    re.compile(r'retry after:?\s*(\d+)'),
+    re.compile(r'retry_after:?\s*(\d+)'),
+    re.compile(r'retry in\s*(\d+)\s*seconds'),
+    re.compile(r'wait for\s*(\d+)\s*seconds'),
+    re.compile(r'"retryDelay":\s*"(\d+)s"'),
+)
+
 def get_retry_after(error: Exception) -> Optional[int]:
     """
     Extracts the 'retry-after' duration in seconds from an exception message.
@@ -34,7 +44,7 @@ def get_retry_after(error: Exception) -> Optional[int]:
     # 1. Try to parse JSON from the error string to find 'retryDelay'
     try:
         # It's common for the actual JSON to be embedded in the string representation
-        json_match = re.search(r'(\{.*\})', error_str)
+        json_match = JSON_OBJECT_PATTERN.search(error_str)
         if json_match:
             error_json = json.loads(json_match.group(1))
             retry_info = error_json.get('error', {}).get('details', [{}])[0]
@@ -51,16 +61,8 @@ def get_retry_after(error: Exception) -> Optional[int]:
         pass # If JSON parsing fails, proceed to regex and attribute checks
 
     # 2. Common regex patterns for 'retry-after'
-    patterns = [
-        r'retry after:?\s*(\d+)',
-        r'retry_after:?\s*(\d+)',
-        r'retry in\s*(\d+)\s*seconds',
-        r'wait for\s*(\d+)\s*seconds',
-        r'"retryDelay":\s*"(\d+)s"',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, error_str)
+    for pattern in RETRY_AFTER_PATTERNS:
+        match = pattern.search(error_str)
         if match:
             try:
                 return int(match.group(1))
@@ -177,19 +179,16 @@ class AllProviders:
         if not model:
             return kwargs
 
-        provider = self._get_provider_from_model(model)
-        provider_settings = self.providers.get(provider, {})
+        provider, _, model_name = model.partition('/')
+        provider_settings = self.providers.get(provider)
+        # Most providers need no overrides, so skip the checks below for them.
+        if not provider_settings:
+            return kwargs
         
         if "api_base" in provider_settings:
             kwargs["api_base"] = provider_settings["api_base"]
         
         if "model_prefix" in provider_settings:
-            kwargs["model"] = f"{provider_settings['model_prefix']}{model.split('/', 1)[1]}"
+            kwargs["model"] = f"{provider_settings['model_prefix']}{model_name}"
             
         return kwargs
-
-    def _get_provider_from_model(self, model: str) -> str:
-        """
-        Determines the provider from the model name.
-        """
-        return model.split('/')[0]
@@ -7,8 +7,7 @@ from datetime import datetime
 def setup_failure_logger():
     """Sets up a dedicated JSON logger for writing detailed failure logs to a file."""
     log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    os.makedirs(log_dir, exist_ok=True)
 
     # Create a logger specifically for failures.
     # This logger will NOT propagate to the root logger.
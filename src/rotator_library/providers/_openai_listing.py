@@ -0,0 +1,22 @@
+import httpx
+from typing import Dict, List
+from .._logging import lib_logger
+
+async def fetch_openai_style_models(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: Dict[str, str],
+    prefix: str,
+    provider_label: str
+) -> List[str]:
+    """
+    Fetches the model list from an OpenAI-style '/models' endpoint, which returns
+    {"data": [{"id": ...}, ...]}, and prefixes each model id with the provider name.
+    """
+    try:
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        return [f"{prefix}/{model['id']}" for model in response.json().get("data", ())]
+    except httpx.RequestError as e:
+        lib_logger.error(f"Failed to fetch {provider_label} models: {e}")
+        return []
@@ -1,12 +1,7 @@
 import httpx
-import logging
 from typing import List
 from .provider_interface import ProviderInterface
-
-lib_logger = logging.getLogger('rotator_library')
-lib_logger.propagate = False # Ensure this logger doesn't propagate to root
-if not lib_logger.handlers:
-    lib_logger.addHandler(logging.NullHandler())
+from ._openai_listing import fetch_openai_style_models
 
 class AnthropicProvider(ProviderInterface):
     """
@@ -16,16 +11,10 @@ class AnthropicProvider(ProviderInterface):
         """
         Fetches the list of available models from the Anthropic API.
         """
-        try:
-            response = await client.get(
-                "https://api.anthropic.com/v1/models",
-                headers={
-                    "x-api-key": api_key,
-                    "anthropic-version": "2023-06-01"
-                }
-            )
-            response.raise_for_status()
-            return [f"anthropic/{model['id']}" for model in response.json().get("data", [])]
-        except httpx.RequestError as e:
-            lib_logger.error(f"Failed to fetch Anthropic models: {e}")
-            return []
+        return await fetch_openai_style_models(
+            client,
+            "https://api.anthropic.com/v1/models",
+            headers={"x-api-key": api_key, "anthropic-version": "2023-06-01"},
+            prefix="anthropic",
+            provider_label="Anthropic"
+        )
@@ -1,12 +1,15 @@
 import httpx
-import logging
 from typing import List
 from .provider_interface import ProviderInterface
+from .._logging import lib_logger
 
-lib_logger = logging.getLogger('rotator_library')
-lib_logger.propagate = False # Ensure this logger doesn't propagate to root
-if not lib_logger.handlers:
-    lib_logger.addHandler(logging.NullHandler())
+# Common Bedrock models, listed statically (see get_models)
+BEDROCK_MODELS = (
+    "bedrock/anthropic.claude-3-sonnet-20240229-v1:0",
+    "bedrock/anthropic.claude-3-haiku-20240307-v1:0",
+    "bedrock/cohere.command-r-plus-v1:0",
+    "bedrock/mistral.mistral-large-2402-v1:0",
+)
 
 class BedrockProvider(ProviderInterface):
     """
@@ -21,9 +24,4 @@ class BedrockProvider(ProviderInterface):
         # For a simple, key-based proxy, we'll list common models.
         # This can be expanded with full AWS authentication if needed.
         lib_logger.info("Returning hardcoded list for Bedrock. Full discovery requires AWS auth.")
-        return [
-            "bedrock/anthropic.claude-3-sonnet-20240229-v1:0",
-            "bedrock/anthropic.claude-3-haiku-20240307-v1:0",
-            "bedrock/cohere.command-r-plus-v1:0",
-            "bedrock/mistral.mistral-large-2402-v1:0",
-        ]
+        return list(BEDROCK_MODELS)
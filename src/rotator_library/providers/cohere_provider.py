@@ -1,12 +1,7 @@
 import httpx
-import logging
 from typing import List
 from .provider_interface import ProviderInterface
-
-lib_logger = logging.getLogger('rotator_library')
-lib_logger.propagate = False # Ensure this logger doesn't propagate to root
-if not lib_logger.handlers:
-    lib_logger.addHandler(logging.NullHandler())
+from .._logging import lib_logger
 
 class CohereProvider(ProviderInterface):
     """
@@ -1,12 +1,7 @@
 import httpx
-import logging
 from typing import List
 from .provider_interface import ProviderInterface
-
-lib_logger = logging.getLogger('rotator_library')
-lib_logger.propagate = False # Ensure this logger doesn't propagate to root
-if not lib_logger.handlers:
-    lib_logger.addHandler(logging.NullHandler())
+from ._openai_listing import fetch_openai_style_models
 
 class MistralProvider(ProviderInterface):
     """
@@ -16,13 +11,10 @@ class MistralProvider(ProviderInterface):
         """
         Fetches the list of available models from the Mistral API.
         """
-        try:
-            response = await client.get(
-                "https://api.mistral.ai/v1/models",
-                headers={"Authorization": f"Bearer {api_key}"}
-            )
-            response.raise_for_status()
-            return [f"mistral/{model['id']}" for model in response.json().get("data", [])]
-        except httpx.RequestError as e:
-            lib_logger.error(f"Failed to fetch Mistral models: {e}")
-            return []
+        return await fetch_openai_style_models(
+            client,
+            "https://api.mistral.ai/v1/models",
+            headers={"Authorization": f"Bearer {api_key}"},
+            prefix="mistral",
+            provider_label="Mistral"
+        )
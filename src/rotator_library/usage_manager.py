@@ -1,19 +1,23 @@
 import json
 import os
 import time
-import logging
 import asyncio
-from datetime import date, datetime, timezone, time as dt_time
+from datetime import datetime, timezone, time as dt_time
 from typing import Any, Dict, List, Optional, Set
 import aiofiles
 import litellm
 
 from .error_handler import ClassifiedError, NoAvailableKeysError
+from ._logging import lib_logger
 
-lib_logger = logging.getLogger('rotator_library')
-lib_logger.propagate = False
-if not lib_logger.handlers:
-    lib_logger.addHandler(logging.NullHandler())
+# Cooldown in seconds applied after N consecutive failures of a key on a model
+BACKOFF_TIERS = {1: 10, 2: 30, 3: 60, 4: 120}
+
+# Number of locks that per-key usage updates are spread across. Must be a power of two.
+USAGE_LOCK_SHARDS = 16
+
+# How long, in seconds, to collect usage updates before writing the usage file once.
+SAVE_DEBOUNCE_SECONDS = 0.1
 
 class UsageManager:
     """
@@ -24,7 +28,11 @@ class UsageManager:
         self.file_path = file_path
         self.key_states: Dict[str, Dict[str, Any]] = {}
         
+        # Guards loading and saving the usage file. Updates to a key's usage data take
+        # that key's shard lock instead, so records for different keys don't serialize.
         self._data_lock = asyncio.Lock()
+        self._key_locks = [asyncio.Lock() for _ in range(USAGE_LOCK_SHARDS)]
+        self._save_task: Optional[asyncio.Task] = None
         self._usage_data: Optional[Dict] = None
         self._initialized = asyncio.Event()
         self._init_lock = asyncio.Lock()
@@ -38,6 +46,10 @@ class UsageManager:
         else:
             self.daily_reset_time_utc = None
 
+    def _lock_for(self, key: str) -> asyncio.Lock:
+        """Returns the shard lock guarding updates to the given key's usage data."""
+        return self._key_locks[hash(key) & (USAGE_LOCK_SHARDS - 1)]
+
     async def _lazy_init(self):
         """Initializes the usage data by loading it from the file asynchronously."""
         async with self._init_lock:
@@ -49,9 +61,8 @@ class UsageManager:
     async def _load_usage(self):
         """Loads usage data from the JSON file asynchronously."""
         async with self._data_lock:
-            if not os.path.exists(self.file_path):
-                self._usage_data = {}
-                return
+            # A missing file is handled by the except below, so there is no separate
+            # existence check (and extra stat call) before opening it.
             try:
                 async with aiofiles.open(self.file_path, 'r') as f:
                     content = await f.read()
@@ -64,8 +75,39 @@ class UsageManager:
         if self._usage_data is None:
             return
         async with self._data_lock:
-            async with aiofiles.open(self.file_path, 'w') as f:
+            # Write to a temporary file and swap it in, so a crash mid-write
+            # never leaves a truncated usage file behind.
+            tmp_path = f"{self.file_path}.tmp"
+            async with aiofiles.open(tmp_path, 'w') as f:
                 await f.write(json.dumps(self._usage_data, indent=2))
+            os.replace(tmp_path, self.file_path)
+
+    def _schedule_save(self):
+        """
+        Schedules a save of the usage data. Updates recorded within the debounce
+        window are written together instead of rewriting the file for each one.
+        """
+        if self._save_task is None:
+            self._save_task = asyncio.create_task(self._delayed_save())
+
+    async def _delayed_save(self):
+        """Waits out the debounce window, then saves the usage data."""
+        await asyncio.sleep(SAVE_DEBOUNCE_SECONDS)
+        # Cleared before saving so updates made during the write schedule another save.
+        self._save_task = None
+        try:
+            await self._save_usage()
+        except Exception as e:
+            # Nothing awaits this task, so report the failure here rather than losing it.
+            # The data stays in memory and is written again by the next save.
+            lib_logger.error(f"Failed to save usage data to {self.file_path}: {e}")
+
+    async def close(self):
+        """Flushes any pending usage data to disk. Call this before shutting down."""
+        if self._save_task is not None:
+            self._save_task.cancel()
+            self._save_task = None
+        await self._save_usage()
 
     async def _reset_daily_stats_if_needed(self):
         """Checks if daily stats need to be reset for any key."""
@@ -116,7 +158,15 @@ class UsageManager:
                     data["last_daily_reset"] = today_str
 
         if needs_saving:
-            await self._save_usage()
+            self._schedule_save()
+
+    @staticmethod
+    def _new_key_data(today_utc_str: str) -> Dict[str, Any]:
+        """
+        Returns the initial usage record for a key seen for the first time. Only called
+        for new keys, rather than building a default dict for every setdefault() call.
+        """
+        return {"daily": {"date": today_utc_str, "models": {}}, "global": {"models": {}}, "model_cooldowns": {}, "failures": {}}
 
     def _initialize_key_states(self, keys: List[str]):
         """Initializes state tracking for all provided keys if not already present."""
@@ -138,29 +188,33 @@ class UsageManager:
         self._initialize_key_states(available_keys)
 
         # This loop continues as long as the global deadline has not been met.
-        while time.time() < deadline:
-            tier1_keys, tier2_keys = [], []
+        # The clock is read once per pass and reused for the cooldown checks below.
+        while True:
             now = time.time()
+            if now >= deadline:
+                break
+            tier1_keys, tier2_keys = [], []
             
             # First, filter the list of available keys to exclude any on cooldown.
-            async with self._data_lock:
-                for key in available_keys:
-                    key_data = self._usage_data.get(key, {})
-                    
-                    if (key_data.get("key_cooldown_until") or 0) > now or \
-                       (key_data.get("model_cooldowns", {}).get(model) or 0) > now:
-                        continue
-
-                    # Prioritize keys based on their current usage to ensure load balancing.
-                    usage_count = key_data.get("daily", {}).get("models", {}).get(model, {}).get("success_count", 0)
-                    key_state = self.key_states[key]
-
-                    # Tier 1: Completely idle keys (preferred).
-                    if not key_state["models_in_use"]:
-                        tier1_keys.append((key, usage_count))
-                    # Tier 2: Keys busy with other models, but free for this one.
-                    elif model not in key_state["models_in_use"]:
-                        tier2_keys.append((key, usage_count))
+            # This pass only reads usage data and never awaits, so it cannot observe
+            # a half-applied update and needs none of the shard locks.
+            for key in available_keys:
+                key_data = self._usage_data.get(key, {})
+                
+                if (key_data.get("key_cooldown_until") or 0) > now or \
+                   (key_data.get("model_cooldowns", {}).get(model) or 0) > now:
+                    continue
+
+                # Prioritize keys based on their current usage to ensure load balancing.
+                usage_count = key_data.get("daily", {}).get("models", {}).get(model, {}).get("success_count", 0)
+                key_state = self.key_states[key]
+
+                # Tier 1: Completely idle keys (preferred).
+                if not key_state["models_in_use"]:
+                    tier1_keys.append((key, usage_count))
+                # Tier 2: Keys busy with other models, but free for this one.
+                elif model not in key_state["models_in_use"]:
+                    tier2_keys.append((key, usage_count))
 
             tier1_keys.sort(key=lambda x: x[1])
             tier2_keys.sort(key=lambda x: x[1])
@@ -189,7 +243,8 @@ class UsageManager:
             all_potential_keys = tier1_keys + tier2_keys
             if not all_potential_keys:
                 lib_logger.warning("No keys are eligible (all on cooldown). Waiting before re-evaluating.")
-                await asyncio.sleep(1)
+                # Never sleep past the deadline; the loop condition then fails straight away.
+                await asyncio.sleep(min(1, deadline - now))
                 continue
 
             # Wait on the condition of the key with the lowest current usage.
@@ -219,11 +274,15 @@ class UsageManager:
 
         state = self.key_states[key]
         async with state["lock"]:
-            if model in state["models_in_use"]:
+            released = model in state["models_in_use"]
+            if released:
                 state["models_in_use"].remove(model)
-                lib_logger.info(f"Released key ...{key[-4:]} from model {model}")
-            else:
-                lib_logger.warning(f"Attempted to release key ...{key[-4:]} for model {model}, but it was not in use.")
+
+        # Logged after the lock is released so waiters aren't held up by log I/O
+        if released:
+            lib_logger.info(f"Released key ...{key[-4:]} from model {model}")
+        else:
+            lib_logger.warning(f"Attempted to release key ...{key[-4:]} for model {model}, but it was not in use.")
 
         # Notify all tasks waiting on this key's condition
         async with state["condition"]:
@@ -235,9 +294,29 @@ class UsageManager:
         It safely handles cases where token usage data is not available.
         """
         await self._lazy_init()
-        async with self._data_lock:
+
+        # Work out token usage and cost before taking the lock. The cost lookup is the
+        # slowest part of recording a success and doesn't touch any shared state.
+        usage = None
+        cost = None
+        if completion_response and hasattr(completion_response, 'usage') and completion_response.usage:
+            usage = completion_response.usage
+            try:
+                # Differentiate cost calculation based on response type
+                if isinstance(completion_response, litellm.EmbeddingResponse):
+                    cost = litellm.embedding_cost(embedding_response=completion_response)
+                else:
+                    cost = litellm.completion_cost(completion_response=completion_response)
+            except Exception as e:
+                lib_logger.warning(f"Could not calculate cost for model {model}: {e}")
+        else:
+            lib_logger.warning(f"No usage data found in completion response for model {model}. Recording success without token count.")
+
+        async with self._lock_for(key):
             today_utc_str = datetime.now(timezone.utc).date().isoformat()
-            key_data = self._usage_data.setdefault(key, {"daily": {"date": today_utc_str, "models": {}}, "global": {"models": {}}, "model_cooldowns": {}, "failures": {}})
+            key_data = self._usage_data.get(key)
+            if key_data is None:
+                key_data = self._usage_data[key] = self._new_key_data(today_utc_str)
             
             # If the key is new, ensure its reset date is initialized to prevent an immediate reset.
             if "last_daily_reset" not in key_data:
@@ -252,45 +331,38 @@ class UsageManager:
             daily_model_data = key_data["daily"]["models"].setdefault(model, {"success_count": 0, "prompt_tokens": 0, "completion_tokens": 0, "approx_cost": 0.0})
             daily_model_data["success_count"] += 1
 
-            # Safely attempt to record token and cost usage
-            if completion_response and hasattr(completion_response, 'usage') and completion_response.usage:
-                usage = completion_response.usage
+            # Record the token and cost usage computed above, if any
+            if usage is not None:
                 daily_model_data["prompt_tokens"] += usage.prompt_tokens
                 daily_model_data["completion_tokens"] += getattr(usage, 'completion_tokens', 0) # Not present in embedding responses
-                lib_logger.info(f"Recorded usage from final stream object for key ...{key[-4:]}")
-                try:
-                    # Differentiate cost calculation based on response type
-                    if isinstance(completion_response, litellm.EmbeddingResponse):
-                        cost = litellm.embedding_cost(embedding_response=completion_response)
-                    else:
-                        cost = litellm.completion_cost(completion_response=completion_response)
-                    
-                    if cost is not None:
-                        daily_model_data["approx_cost"] += cost
-                except Exception as e:
-                    lib_logger.warning(f"Could not calculate cost for model {model}: {e}")
-            else:
-                lib_logger.warning(f"No usage data found in completion response for model {model}. Recording success without token count.")
+                if cost is not None:
+                    daily_model_data["approx_cost"] += cost
 
             key_data["last_used_ts"] = time.time()
         
-        await self._save_usage()
+        if usage is not None:
+            lib_logger.info(f"Recorded usage from final stream object for key ...{key[-4:]}")
+        self._schedule_save()
 
     async def record_failure(self, key: str, model: str, classified_error: ClassifiedError):
         """Records a failure and applies cooldowns based on an escalating backoff strategy."""
         await self._lazy_init()
-        async with self._data_lock:
+        async with self._lock_for(key):
+            # One timestamp for every cooldown and record written by this failure
+            now = time.time()
             today_utc_str = datetime.now(timezone.utc).date().isoformat()
-            key_data = self._usage_data.setdefault(key, {"daily": {"date": today_utc_str, "models": {}}, "global": {"models": {}}, "model_cooldowns": {}, "failures": {}})
+            key_data = self._usage_data.get(key)
+            if key_data is None:
+                key_data = self._usage_data[key] = self._new_key_data(today_utc_str)
             
             # Handle specific error types first
             if classified_error.error_type == 'rate_limit' and classified_error.retry_after:
                 cooldown_seconds = classified_error.retry_after
             elif classified_error.error_type == 'authentication':
                 # Apply a 5-minute key-level lockout for auth errors
-                key_data["key_cooldown_until"] = time.time() + 300
+                key_data["key_cooldown_until"] = now + 300
                 lib_logger.warning(f"Authentication error on key ...{key[-4:]}. Applying 5-minute key-level lockout.")
-                await self._save_usage()
+                self._schedule_save()
                 return # No further backoff logic needed
             else:
                 # General backoff logic for other errors
@@ -299,33 +371,30 @@ class UsageManager:
                 model_failures["consecutive_failures"] += 1
                 count = model_failures["consecutive_failures"]
 
-                backoff_tiers = {1: 10, 2: 30, 3: 60, 4: 120}
-                cooldown_seconds = backoff_tiers.get(count, 7200) # Default to 2 hours
+                cooldown_seconds = BACKOFF_TIERS.get(count, 7200) # Default to 2 hours
 
             # Apply the cooldown
             model_cooldowns = key_data.setdefault("model_cooldowns", {})
-            model_cooldowns[model] = time.time() + cooldown_seconds
+            model_cooldowns[model] = now + cooldown_seconds
             lib_logger.warning(f"Failure recorded for key ...{key[-4:]} with model {model}. Applying {cooldown_seconds}s cooldown.")
 
             # Check for key-level lockout condition
-            await self._check_key_lockout(key, key_data)
+            await self._check_key_lockout(key, key_data, now)
 
             key_data["last_failure"] = {
-                "timestamp": time.time(),
+                "timestamp": now,
                 "model": model,
                 "error": str(classified_error.original_exception)
             }
         
-        await self._save_usage()
+        self._schedule_save()
 
-    async def _check_key_lockout(self, key: str, key_data: Dict):
+    async def _check_key_lockout(self, key: str, key_data: Dict, now: float):
         """Checks if a key should be locked out due to multiple model failures."""
-        long_term_lockout_models = 0
-        now = time.time()
-        
-        for model, cooldown_end in key_data.get("model_cooldowns", {}).items():
-            if cooldown_end - now >= 7200: # Check for 2-hour lockouts
-                long_term_lockout_models += 1
+        long_term_lockout_models = sum(
+            1 for cooldown_end in key_data.get("model_cooldowns", {}).values()
+            if cooldown_end - now >= 7200 # Check for 2-hour lockouts
+        )
         
         if long_term_lockout_models >= 3:
             key_data["key_cooldown_until"] = now + 300 # 5-minute key lockout